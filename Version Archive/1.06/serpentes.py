@@ -0,0 +1,2168 @@
+import time
+
+STARTED_AT = time.perf_counter()  # before any other import, so their cost counts too
+
+import tkinter as tk
+import random
+from array import array
+from collections import deque
+import gc
+import json
+import math
+import sys
+
+with open("config.json", "r") as f:
+    cfg = json.load(f)
+
+NUM_WINDOWS = cfg["game"]["num_windows"]
+ROWS = cfg["game"]["rows"]
+COLS = cfg["game"]["cols"]
+CELL = cfg["game"]["cell"]
+TICK_MS = cfg["game"]["tick_ms"]
+ANIM_MS = cfg["game"]["anim_ms"]
+SWAP_INTERVAL_MS = cfg["game"]["swap_interval_ms"]
+SWAP_DURATION_MS = cfg["game"]["swap_duration_ms"]
+DRIFT_RADIUS = cfg["game"]["drift_radius"]
+
+HEAD_COLOR = cfg["colors"]["head_color"]
+BODY_COLOR = cfg["colors"]["body_color"]
+FOOD_COLOR = cfg["colors"]["food_color"]
+BG_COLOR = cfg["colors"]["bg_color"]
+
+ENEMY_HEAD_COLOR = cfg["colors"]["enemy_head_color"]
+ENEMY_BODY_COLOR = cfg["colors"]["enemy_body_color"]
+ENEMY_AURA_COLOR = cfg["colors"]["enemy_aura_color"]
+ENEMY_AURA_PAD = cfg["enemy"]["aura_pad"]
+ENEMY_CAN_EAT_FOOD = cfg["enemy"]["can_eat_food"]
+ENEMY_AI_MODE = cfg["enemy"].get("ai_mode", "classic")
+
+ENEMY_SPAWN_LENGTH = cfg["enemy"]["spawn_length"]
+ENEMY_INITIAL_LENGTH = cfg["enemy"]["initial_length"]
+ENEMY_SPEED_FACTOR = cfg["enemy"]["speed_factor"]
+
+SPECIAL_FOOD_COLOR = cfg["colors"]["special_food_color"]
+SPECIAL_FOOD_CHANCE = cfg["special_food"]["chance"]
+SPECIAL_FOOD_LENGTH = cfg["special_food"]["length"]
+SPECIAL_FOOD_ADD_WINDOW = cfg["special_food"]["add_window"]
+
+SCORE_WINDOW_HEIGHT = cfg["score_window"]["height"]
+SCORE_FONT = tuple(cfg["score_window"]["font"])
+HUD_STATS_MS = 1000  # how often ticks/sec and frame time are sampled
+SCORE_BG_COLOR = cfg["colors"]["score_bg_color"]
+SCORE_FG_COLOR = cfg["colors"]["score_fg_color"]
+
+RESET_POWERUP_COLOR = cfg["colors"]["reset_powerup_color"]
+RESET_POWERUP_CHANCE = cfg["reset_powerup"]["chance"]
+
+PERF = cfg.get("performance", {})
+BATCH_TCL = PERF.get("batch_tcl", False)
+SNAKE_RUNS = PERF.get("snake_runs", False)
+RENDERER = PERF.get("renderer", "canvas")
+PAUSE_IN_BACKGROUND = PERF.get("pause_in_background", True)
+DISPLAY_MODE = PERF.get("display", "windows")  # "windows" or "viewport"
+VIEWPORT_COLUMNS = PERF.get("viewport_columns", 8)
+BOARDS_PER_FRAME = PERF.get("boards_per_frame", 2)  # 0 creates every window up front
+GC_STATS = PERF.get("gc_stats", False)    # count objects retained per tick and GC pauses
+GC_FREEZE = PERF.get("gc_freeze", False)  # gc.freeze() once startup is done
+STARTUP_STATS = PERF.get("startup_stats", False)  # print time to first frame and to all windows
+USE_NUMPY = PERF.get("use_numpy", True)
+NUMPY_MIN_WINDOWS = PERF.get("numpy_min_windows", 64)  # below this the Python loops are faster
+DRIFT_MODEL = PERF.get("drift_model", "velocity")  # "velocity" or "analytic"
+DRIFT_WAVES = 3  # sinusoids per axis in the analytic drift model
+
+DRIFT_UNLOCK_LENGTH = 8
+MAX_CATCH_UP_TICKS = 5  # logic steps one wakeup may run when the loop falls behind
+# Directions are small ints, also the column in the move tables. Per-move
+# deltas live in those tables (see ring_topology), so turning and moving are
+# just index lookups.
+LEFT, RIGHT, UP, DOWN = range(4)
+DIRECTIONS = (LEFT, RIGHT, UP, DOWN)
+OPPOSITE = (RIGHT, LEFT, DOWN, UP)
+KEY_DIRECTIONS = {
+    "left": LEFT, "a": LEFT,
+    "right": RIGHT, "d": RIGHT,
+    "up": UP, "w": UP,
+    "down": DOWN, "s": DOWN,
+}
+# Where the smart enemy may head, by which side of it the food is on:
+# indexed by (sign(food col - col) + 1) * 3 + sign(food row - row) + 1
+SEEK_DIRECTIONS = tuple(
+    tuple(d for d, wanted in ((LEFT, dc < 0), (RIGHT, dc > 0), (UP, dr < 0), (DOWN, dr > 0)) if wanted) or DIRECTIONS
+    for dc in (-1, 0, 1) for dr in (-1, 0, 1)
+)
+WALL = -1  # next-cell sentinel: moving that way is fatal
+
+def ring_topology(num_windows, rows, cols, tables=None):
+    # Windows side by side in a loop: leaving a column edge enters the next
+    # (or previous) window, the top and bottom rows are walls. Returns flat
+    # next-cell tables indexed by cell_id * 4 + direction, one for the player
+    # and one for the enemy, which is clamped at the walls instead of dying.
+    # Other layouts only need to produce the same two tables.
+    #
+    # Given the (player, enemy) tables built for a different window count,
+    # resizes them in place: only added windows are filled in, and the seam
+    # between the last window and window 0 is re-linked.
+    per_window = rows * cols
+    size = num_windows * per_window * 4
+    if tables is None:
+        player = array('i', [WALL]) * size
+        enemy = array('i', [WALL]) * size
+        update = range(num_windows)
+    else:
+        player, enemy = tables
+        first = min(len(player) // (per_window * 4), num_windows)
+        for table in tables:
+            if len(table) > size:
+                del table[size:]
+            else:
+                table.extend(array('i', [WALL]) * (size - len(table)))
+        update = sorted({0, max(first - 1, 0)} | set(range(first, num_windows)))
+    for w in update:
+        for r in range(rows):
+            for c in range(cols):
+                cell = w * per_window + r * cols + c
+                base = cell * 4
+                if c > 0:
+                    left = cell - 1
+                else:
+                    left = (w - 1) % num_windows * per_window + r * cols + cols - 1
+                if c < cols - 1:
+                    right = cell + 1
+                else:
+                    right = (w + 1) % num_windows * per_window + r * cols
+                up = cell - cols if r > 0 else WALL
+                down = cell + cols if r < rows - 1 else WALL
+                player[base:base + 4] = array('i', (left, right, up, down))
+                enemy[base:base + 4] = array('i', (
+                    left, right,
+                    cell if up == WALL else up,
+                    cell if down == WALL else down,
+                ))
+    return player, enemy
+
+class CellRing:
+    # A snake body as packed cell ids (GameState.cell_id) in a preallocated
+    # array used as a ring buffer, tail first. Moving is one store and one
+    # index bump; no tuple or deque node per segment. Grows (rarely) by
+    # copying into a bigger array. `head` is the last cell appended, and with
+    # `length` is what the game loop reads, as plain attributes.
+    __slots__ = ("cells", "start", "length", "head")
+
+    def __init__(self, capacity):
+        self.cells = array('i', [0]) * max(1, capacity)
+        self.start = 0
+        self.length = 0
+        self.head = -1
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.length
+        if not 0 <= i < self.length:
+            raise IndexError("CellRing index out of range")
+        return self.cells[(self.start + i) % len(self.cells)]
+
+    def __iter__(self):
+        cells, size = self.cells, len(self.cells)
+        for i in range(self.start, self.start + self.length):
+            yield cells[i % size]
+
+    def clear(self):
+        self.start = self.length = 0
+        self.head = -1
+
+    def append(self, cell):
+        size = len(self.cells)
+        if self.length == size:
+            self.reserve(2 * size)
+            size = len(self.cells)
+        i = self.start + self.length
+        self.cells[i - size if i >= size else i] = cell
+        self.length += 1
+        self.head = cell
+
+    def popleft(self):
+        cell = self.cells[self.start]
+        self.start += 1
+        if self.start == len(self.cells):
+            self.start = 0
+        self.length -= 1
+        return cell
+
+    def reserve(self, capacity):
+        if capacity <= len(self.cells):
+            return
+        cells = array('i', self)
+        cells.extend(array('i', [0]) * (capacity - len(cells)))
+        self.cells = cells
+        self.start = 0
+
+class Food:
+    # The one food item on the board; GameState reuses it for every placement
+    __slots__ = ("pos", "cell", "type")
+
+    def __init__(self):
+        self.pos = None   # (w, r, c)
+        self.cell = -1    # cell id of pos
+        self.type = "normal"
+
+class GameState:
+    # Pure game rules (snake, enemy, food, score). No Tk in here, so it can be
+    # stepped headless: state = GameState(); while state.step(RIGHT): ...
+    # Steady-state step() builds no tuples, lists or dicts: bodies are int
+    # rings, the food object is reused, moves and collisions are table and
+    # array lookups, and the enemy AI works on plain ints.
+    __slots__ = (
+        "num_windows", "rows", "cols", "rng", "base_windows", "topology",
+        "moves", "enemy_moves", "reset_powerups", "generation", "snake",
+        "enemy_snake", "spare_food", "running", "won", "death_reason", "score",
+        "ticks", "direction", "next_direction", "eaten", "grow", "occupancy",
+        "free_cells", "free_slot", "head_count", "tail_count",
+        "enemy_head_count", "enemy_tail_count", "food_count", "food", "enemy_dir",
+    )
+
+    def __init__(self, num_windows=None, rows=None, cols=None, rng=None, topology=ring_topology):
+        # Read the module globals at construction time so mods that patch
+        # serpentes.NUM_WINDOWS before creating the game still work.
+        self.num_windows = NUM_WINDOWS if num_windows is None else num_windows
+        self.rows = ROWS if rows is None else rows
+        self.cols = COLS if cols is None else cols
+        self.rng = random if rng is None else rng
+        self.base_windows = self.num_windows  # add_window() grows past this until reset()
+        # Compiled once (and patched by add_window()); step() only ever looks
+        # moves up in these tables
+        self.topology = topology
+        self.moves, self.enemy_moves = topology(self.num_windows, self.rows, self.cols)
+
+        self.reset_powerups = False  # set by the front-end once windows move
+        self.generation = 0  # bumped on every reset so renderers start over
+        # Bodies as cell ids, head last; cell_pos() turns one back into (w, r, c).
+        # The player can at most fill the board; the enemy stays short.
+        self.snake = CellRing(self.num_windows * self.rows * self.cols)
+        self.enemy_snake = CellRing(ENEMY_INITIAL_LENGTH + 1)
+        self.spare_food = Food()
+        self.reset()
+
+    def reset(self):
+        if self.num_windows != self.base_windows:
+            self.num_windows = self.base_windows
+            self.moves, self.enemy_moves = self.topology(
+                self.num_windows, self.rows, self.cols, (self.moves, self.enemy_moves))
+        self.generation += 1
+        self.running = True
+        self.won = False
+        self.death_reason = None
+        self.score = 0
+        self.ticks = 0
+        self.direction = RIGHT
+        self.next_direction = RIGHT
+        self.eaten = None  # food type eaten during the last step, if any
+        self.grow = 0  # segments still owed from special food
+
+        # Number of snake segments on each cell, indexed by cell_id(). Kept in
+        # step with every append/popleft so collision checks never scan the
+        # snakes. A count rather than a flag because the enemy may overlap
+        # itself or the player.
+        num_cells = self.num_windows * self.rows * self.cols
+        self.occupancy = bytearray(num_cells)
+        # Unoccupied cell ids in no particular order, plus each cell's index
+        # in that list (-1 while occupied). Swap-remove keeps both O(1), so
+        # food and enemy spawns pick a free cell directly instead of
+        # rejection-sampling the whole board.
+        self.free_cells = list(range(num_cells))
+        self.free_slot = array('i', range(num_cells))
+
+        mid_r = self.rows // 2
+        mid_c = self.cols // 2
+        self.snake.clear()
+        for c in range(mid_c - 4, mid_c + 1):
+            self.snake.append(self.cell_id((0, mid_r, c)))
+        # Running totals of segments ever appended/removed, per snake, and of
+        # food placements. Renderers diff these against what they last drew.
+        self.head_count = len(self.snake)
+        self.tail_count = 0
+        self.enemy_head_count = 0
+        self.enemy_tail_count = 0
+        self.food_count = 0
+        for cell in self.snake:
+            self.occupy(cell)
+
+        self.enemy_snake.clear()  # empty until spawned
+        self.enemy_dir = None
+        self.place_food()
+
+    def add_window(self):
+        # One more window on the end of the ring. Existing cell ids don't
+        # change, so the snakes, food and occupancy stay valid; the new cells
+        # are appended to every index.
+        self.num_windows += 1
+        self.moves, self.enemy_moves = self.topology(
+            self.num_windows, self.rows, self.cols, (self.moves, self.enemy_moves))
+        first = len(self.occupancy)
+        added = self.rows * self.cols
+        self.snake.reserve(first + added)
+        self.occupancy.extend(bytes(added))
+        self.free_slot.extend(range(len(self.free_cells), len(self.free_cells) + added))
+        self.free_cells.extend(range(first, first + added))
+
+    def cell_id(self, pos):
+        w, r, c = pos
+        return (w * self.rows + r) * self.cols + c
+
+    def cell_pos(self, cell):
+        w, rc = divmod(cell, self.rows * self.cols)
+        r, c = divmod(rc, self.cols)
+        return (w, r, c)
+
+    def occupy(self, cell):
+        occupancy = self.occupancy
+        if not occupancy[cell]:
+            free, slot = self.free_cells, self.free_slot
+            i = slot[cell]
+            last = free.pop()
+            if last != cell:
+                free[i] = last
+                slot[last] = i
+            slot[cell] = -1
+        occupancy[cell] += 1
+
+    def vacate(self, cell):
+        occupancy = self.occupancy
+        occupancy[cell] -= 1
+        if not occupancy[cell]:
+            self.free_slot[cell] = len(self.free_cells)
+            self.free_cells.append(cell)
+
+    def random_free_cell(self):
+        free = self.free_cells
+        if not free:
+            return None
+        return self.cell_pos(free[self.rng.randrange(len(free))])
+
+    def turn(self, direction):
+        if direction != OPPOSITE[self.direction]:
+            self.next_direction = direction
+
+    def place_food(self):
+        # Returns False when there is no free cell left to put food on.
+        free = self.free_cells
+        if not free:
+            self.food = None
+            self.food_count += 1
+            return False
+        food = self.food = self.spare_food
+        food.cell = free[self.rng.randrange(len(free))]
+        food.pos = self.cell_pos(food.cell)
+        if self.reset_powerups and self.rng.random() < RESET_POWERUP_CHANCE:
+            food.type = 'reset'
+        elif SPECIAL_FOOD_CHANCE and self.rng.random() < SPECIAL_FOOD_CHANCE:
+            food.type = 'special'
+        else:
+            food.type = 'normal'
+        self.food_count += 1
+        return True
+
+    def kill(self, reason):
+        self.running = False
+        self.death_reason = reason
+
+    def win(self):
+        # The board is full: nowhere left for food, so the round is over.
+        self.kill("You filled every window.")
+        self.won = True
+
+    def step(self, direction=None):
+        if not self.running:
+            return False
+        if direction is not None:
+            self.turn(direction)
+
+        self.ticks += 1
+        self.eaten = None
+
+        self.direction = self.next_direction
+        head_id = self.moves[self.snake.head * 4 + self.direction]
+        if head_id == WALL:
+            self.kill("You hit the wall.")
+            return False
+
+        # Checked before the tail moves, so chasing your own tail is fatal
+        if self.occupancy[head_id]:
+            self.kill("You rammed into a snake.")
+            return False
+
+        ate = head_id == self.food.cell
+        self.snake.append(head_id)
+        self.occupy(head_id)
+        self.head_count += 1
+        if not ate:
+            if self.grow:
+                self.grow -= 1
+            else:
+                self.vacate(self.snake.popleft())
+                self.tail_count += 1
+        else:
+            self.score += 1
+            self.eaten = self.food.type
+            if self.eaten == 'reset':
+                # Windows snap home, so no more reset powerups until they move again
+                self.reset_powerups = False
+            elif self.eaten == 'special':
+                self.grow += SPECIAL_FOOD_LENGTH - 1
+                if SPECIAL_FOOD_ADD_WINDOW:
+                    self.add_window()
+            if not self.place_food():
+                self.win()
+                return False
+
+        if self.snake.length >= ENEMY_SPAWN_LENGTH and not self.enemy_snake.length:
+            self.spawn_enemy()
+
+        if self.enemy_snake.length:
+            self.step_enemy()
+        return self.running
+
+    def spawn_enemy(self):
+        pos = self.random_free_cell()
+        if pos is None:
+            return  # no room yet, try again next tick
+        cell = self.cell_id(pos)
+        self.enemy_snake.append(cell)
+        self.enemy_head_count += 1
+        self.occupy(cell)
+        self.enemy_dir = self.rng.choice(DIRECTIONS)
+
+    def step_enemy(self):
+        rng = self.rng
+        if ENEMY_AI_MODE != "classic": # Smart AI: move towards the food using Manhattan distance
+            cols = self.cols
+            per_window = self.rows * cols
+            head = self.enemy_snake.head % per_window
+            food = self.food.cell % per_window
+            eh_r = head // cols
+            eh_c = head % cols
+            food_r = food // cols
+            food_c = food % cols
+            dc = (food_c > eh_c) - (food_c < eh_c)
+            dr = (food_r > eh_r) - (food_r < eh_r)
+            self.enemy_dir = rng.choice(SEEK_DIRECTIONS[(dc + 1) * 3 + dr + 1])
+        # Classic AI (left/right biased) just keeps going in enemy_dir
+
+        ehead_id = self.enemy_moves[self.enemy_snake.head * 4 + self.enemy_dir]
+        if self.occupancy[ehead_id]:
+            # Pick a safe random direction if blocked
+            self.enemy_dir = rng.choice(DIRECTIONS)
+
+        # Handle eating food
+        if ENEMY_CAN_EAT_FOOD and self.food.cell == ehead_id:
+            if self.food.type == 'normal':
+                self.score = max(0, self.score - 1)
+            if not self.place_food():
+                self.win()
+        else:
+            self.enemy_snake.append(ehead_id)
+            self.occupy(ehead_id)
+            self.enemy_head_count += 1
+            if self.enemy_snake.length > ENEMY_INITIAL_LENGTH:
+                self.vacate(self.enemy_snake.popleft())
+                self.enemy_tail_count += 1
+
+class TkCommandBatch:
+    # All canvas and window-manager calls for a frame go through here. With
+    # batching on they are collected as Tcl and sent to the interpreter in a
+    # single eval() by flush(); with it off each call goes straight to Tk as
+    # before, so the two paths can be compared. Canvas items are named by
+    # our own tags so nothing needs a return value from Tcl.
+    def __init__(self, root, batched=None):
+        self.tk = root.tk
+        self.batched = BATCH_TCL if batched is None else batched
+        self.script = []
+        self.next_tag = 0
+        self.flushes = 0
+        self.commands = 0
+
+    def summary(self):
+        if not self.batched:
+            return "Tcl batching off"
+        per_flush = self.commands / self.flushes if self.flushes else 0.0
+        return f"Tcl flushes: {self.flushes}, commands: {self.commands} ({per_flush:.1f} per flush)"
+
+    def new_tag(self):
+        self.next_tag += 1
+        return f"i{self.next_tag}"
+
+    def create_rect(self, canvas, tag, box, color, state="normal"):
+        if self.batched:
+            x1, y1, x2, y2 = box
+            self.script.append(f"{canvas} create rectangle {x1} {y1} {x2} {y2} -fill {color} -outline {{}} -state {state} -tags {tag}")
+        else:
+            canvas.create_rectangle(*box, fill=color, outline="", state=state, tags=tag)
+
+    def recolor(self, canvas, tag, color):
+        if self.batched:
+            self.script.append(f"{canvas} itemconfigure {tag} -fill {color}")
+        else:
+            canvas.itemconfigure(tag, fill=color)
+
+    def create_polygon(self, canvas, tag, points, color):
+        if self.batched:
+            self.script.append(f"{canvas} create polygon {' '.join(map(str, points))} -fill {color} -outline {{}} -tags {tag}")
+        else:
+            canvas.create_polygon(*points, fill=color, outline="", tags=tag)
+
+    def coords(self, canvas, tag, points):
+        if self.batched:
+            self.script.append(f"{canvas} coords {tag} {' '.join(map(str, points))}")
+        else:
+            canvas.coords(tag, *points)
+
+    def raise_above(self, canvas, tag, above):
+        if self.batched:
+            self.script.append(f"{canvas} raise {tag} {above}")
+        else:
+            canvas.tag_raise(tag, above)
+
+    def delete(self, canvas, *tags):
+        if self.batched:
+            self.script.append(f"{canvas} delete {' '.join(tags)}")
+        else:
+            canvas.delete(*tags)
+
+    def geometry(self, win, spec):
+        if self.batched:
+            self.script.append(f"wm geometry {win} {spec}")
+        else:
+            win.geometry(spec)
+
+    def flush(self):
+        if not self.script:
+            return
+        self.commands += len(self.script)
+        self.flushes += 1
+        script = "\n".join(self.script)
+        self.script.clear()
+        self.tk.eval(script)
+
+# Turn preference when tracing outlines through a vertex shared by two
+# corners: right, straight on, then left (screen coordinates, y down).
+_TURN_ORDER = {
+    (1, 0): ((0, 1), (1, 0), (0, -1)),
+    (0, 1): ((-1, 0), (0, 1), (1, 0)),
+    (-1, 0): ((0, -1), (-1, 0), (0, 1)),
+    (0, -1): ((1, 0), (0, -1), (-1, 0)),
+}
+
+def aura_outline(cells, pad):
+    # Outline of the union of the cells in `cells` ((row, col) pairs), each
+    # grown by `pad` pixels. Returns one flat [x0, y0, x1, y1, ...] point list
+    # per separate blob. Holes (only possible if a long enemy curls round on
+    # itself) are filled in.
+    if not cells:
+        return []
+    xs = sorted({v for _, c in cells for v in (c * CELL - pad, (c + 1) * CELL + pad)})
+    ys = sorted({v for r, _ in cells for v in (r * CELL - pad, (r + 1) * CELL + pad)})
+    xi = {x: i for i, x in enumerate(xs)}
+    yi = {y: i for i, y in enumerate(ys)}
+    filled = set()
+    for r, c in cells:
+        for i in range(xi[c * CELL - pad], xi[(c + 1) * CELL + pad]):
+            for j in range(yi[r * CELL - pad], yi[(r + 1) * CELL + pad]):
+                filled.add((i, j))
+
+    # Boundary edges run clockwise round the filled area (interior on the right)
+    edges = {}
+    for i, j in filled:
+        if (i, j - 1) not in filled:
+            edges.setdefault((i, j), []).append((1, 0))
+        if (i + 1, j) not in filled:
+            edges.setdefault((i + 1, j), []).append((0, 1))
+        if (i, j + 1) not in filled:
+            edges.setdefault((i + 1, j + 1), []).append((-1, 0))
+        if (i - 1, j) not in filled:
+            edges.setdefault((i, j + 1), []).append((0, -1))
+
+    polygons = []
+    while edges:
+        start = next(iter(edges))
+        point, heading = start, None
+        loop = []
+        while True:
+            out = edges.get(point)
+            if not out:
+                break
+            if heading is None or len(out) == 1:
+                step = out[0]
+            else:
+                step = next(d for d in _TURN_ORDER[heading] if d in out)
+            out.remove(step)
+            if not out:
+                del edges[point]
+            if step != heading:
+                loop.append(point)
+            heading = step
+            point = (point[0] + step[0], point[1] + step[1])
+        # Twice the signed area: positive for outer (clockwise) loops
+        area = 0
+        n = len(loop)
+        for k in range(n):
+            x0, y0 = xs[loop[k][0]], ys[loop[k][1]]
+            x1, y1 = xs[loop[(k + 1) % n][0]], ys[loop[(k + 1) % n][1]]
+            area += x0 * y1 - x1 * y0
+        if area > 0:
+            polygons.append([v for i, j in loop for v in (xs[i], ys[j])])
+    return polygons
+
+class WindowPositions:
+    # Moves the game windows. Remembers the last integer position applied
+    # to each one, drops moves that round to where the window already is,
+    # keeps only the latest move per window within a frame, and sends
+    # position-only geometry ("+x+y") through the Tcl batch on flush().
+    def __init__(self, tcl):
+        self.tcl = tcl
+        self.windows = []
+        self.applied = []   # [(x, y), ...] last position sent per window
+        self.pending = {}   # window index -> (x, y) for this frame
+        self.moves_sent = 0
+        self.moves_skipped = 0
+
+    def add(self, win, x, y):
+        # The window's initial geometry (size included) is set by the caller.
+        # win may be None for a window that isn't created yet; see attach().
+        self.windows.append(win)
+        self.applied.append((int(round(x)), int(round(y))))
+        return len(self.windows) - 1
+
+    def attach(self, i, win, x, y):
+        self.windows[i] = win
+        self.applied[i] = (int(round(x)), int(round(y)))
+        self.pending.pop(i, None)
+
+    def move(self, i, x, y):
+        pos = (int(round(x)), int(round(y)))
+        if pos == self.applied[i]:
+            self.pending.pop(i, None)
+            self.moves_skipped += 1
+            return
+        self.pending[i] = pos
+
+    def flush(self):
+        if not self.pending:
+            return
+        for i, pos in self.pending.items():
+            if self.windows[i] is None:
+                continue  # attach() places it where it is by then
+            self.applied[i] = pos
+            self.tcl.geometry(self.windows[i], f"+{pos[0]}+{pos[1]}")
+        self.moves_sent += len(self.pending)
+        self.pending.clear()
+
+class ViewportPositions(WindowPositions):
+    # Viewport display mode: every board is an embedded window item on one
+    # host canvas, so moving a board is a canvas coords call instead of a
+    # window-manager request. Positions are host-canvas coordinates and are
+    # clamped so a drifting board never leaves the host.
+    def __init__(self, tcl, host, host_size, board_size):
+        super().__init__(tcl)
+        self.host = host
+        self.board_size = board_size
+        self.resize(host_size)
+
+    def resize(self, host_size):
+        self.max_x = max(0, host_size[0] - self.board_size[0])
+        self.max_y = max(0, host_size[1] - self.board_size[1])
+
+    def move(self, i, x, y):
+        super().move(i, min(max(x, 0), self.max_x), min(max(y, 0), self.max_y))
+
+    def flush(self):
+        if not self.pending:
+            return
+        for i, pos in self.pending.items():
+            if self.windows[i] is None:
+                continue
+            self.applied[i] = pos
+            self.tcl.coords(self.host, self.windows[i], pos)
+        self.moves_sent += len(self.pending)
+        self.pending.clear()
+
+class WindowDrift:
+    # Home (base), live position and velocity of every board window, kept as
+    # flat per-axis arrays so a drift frame is one bulk update: vectorised
+    # with NumPy when it's installed, otherwise a single tight loop. Same
+    # model as before: move by velocity, bounce off DRIFT_RADIUS around home
+    # losing 10%, add uniform(-0.4, 0.4) noise, clamp to the drift speed.
+    #
+    # The "analytic" model instead makes each window's offset from home a
+    # fixed function of its own drift clock: a seeded sum of DRIFT_WAVES
+    # sinusoids per axis whose amplitudes add up to DRIFT_RADIUS / 2, so it
+    # never leaves the radius. The clock advances by elapsed time times the
+    # drift speed, so a late or skipped frame lands exactly where it would
+    # have anyway. Windows being swapped keep their clock stopped, and
+    # swap_base() hands the clock and waves over along with the home spot, so
+    # a finished swap carries on from the swap target without a jump.
+    def __init__(self, use_numpy=None, model=None):
+        self.use_numpy = USE_NUMPY if use_numpy is None else use_numpy
+        self.np = None  # the numpy module, once there are NUMPY_MIN_WINDOWS windows
+        self.rng = random
+        self.model = model or DRIFT_MODEL
+        self.base_x, self.base_y = [], []
+        self.pos_x, self.pos_y = [], []
+        self.vel_x, self.vel_y = [], []
+        self.clock = []
+        # One row of 2 * DRIFT_WAVES terms per window: x waves, then y waves
+        self.amp, self.freq, self.phase = [], [], []
+        self.last_ms = None
+        self.maybe_use_numpy()
+
+    def maybe_use_numpy(self):
+        # NumPy's per-call overhead outweighs the Python loops for a handful
+        # of windows, so it is only imported once the count reaches
+        # NUMPY_MIN_WINDOWS; the lists built so far are converted in place
+        if self.np or not self.use_numpy or len(self) < NUMPY_MIN_WINDOWS:
+            return
+        try:
+            import numpy
+        except ImportError:
+            self.use_numpy = False
+            return
+        self.np = numpy
+        self.rng = numpy.random.default_rng()
+        for name in ("base_x", "base_y", "pos_x", "pos_y", "vel_x", "vel_y", "clock"):
+            setattr(self, name, numpy.array(getattr(self, name), dtype=float))
+        for name in ("amp", "freq", "phase"):
+            setattr(self, name, numpy.array(getattr(self, name), dtype=float).reshape(-1, 2 * DRIFT_WAVES))
+
+    def __len__(self):
+        return len(self.pos_x)
+
+    def add(self, x, y):
+        if self.np:
+            append = self.np.append
+            self.base_x, self.base_y = append(self.base_x, x), append(self.base_y, y)
+            self.pos_x, self.pos_y = append(self.pos_x, x), append(self.pos_y, y)
+            self.vel_x, self.vel_y = append(self.vel_x, 0.0), append(self.vel_y, 0.0)
+            self.clock = append(self.clock, 0.0)
+            amp, freq, phase = self.new_waves()
+            vstack = self.np.vstack
+            self.amp = vstack((self.amp, amp))
+            self.freq = vstack((self.freq, freq))
+            self.phase = vstack((self.phase, phase))
+        else:
+            self.base_x.append(float(x))
+            self.base_y.append(float(y))
+            self.pos_x.append(float(x))
+            self.pos_y.append(float(y))
+            self.vel_x.append(0.0)
+            self.vel_y.append(0.0)
+            self.clock.append(0.0)
+            amp, freq, phase = self.new_waves()
+            self.amp.append(amp)
+            self.freq.append(freq)
+            self.phase.append(phase)
+            self.maybe_use_numpy()
+
+    def new_waves(self):
+        uniform = random.uniform
+        amp, freq, phase = [], [], []
+        for _ in range(2):
+            weights = [uniform(0.5, 1.0) for _ in range(DRIFT_WAVES)]
+            total = sum(weights)
+            amp += [0.5 * w / total for w in weights]
+            freq += [uniform(0.6, 1.4) for _ in range(DRIFT_WAVES)]
+            phase += [uniform(0.0, 2.0 * math.pi) for _ in range(DRIFT_WAVES)]
+        return amp, freq, phase
+
+    def get(self, i):
+        return float(self.pos_x[i]), float(self.pos_y[i])
+
+    def set(self, i, x, y):
+        self.pos_x[i] = x
+        self.pos_y[i] = y
+
+    def get_base(self, i):
+        return int(self.base_x[i]), int(self.base_y[i])
+
+    def swap_base(self, a, b):
+        for axis in (self.base_x, self.base_y, self.clock):
+            axis[a], axis[b] = axis[b], axis[a]
+        for waves in (self.amp, self.freq, self.phase):
+            if self.np:
+                waves[[a, b]] = waves[[b, a]]
+            else:
+                waves[a], waves[b] = waves[b], waves[a]
+
+    def get_vel(self, i):
+        return float(self.vel_x[i]), float(self.vel_y[i])
+
+    def set_vel(self, i, vx, vy):
+        self.vel_x[i] = vx
+        self.vel_y[i] = vy
+
+    def randomize(self, speed):
+        n = len(self)
+        if self.np:
+            self.vel_x = self.rng.uniform(-speed, speed, n)
+            self.vel_y = self.rng.uniform(-speed, speed, n)
+        else:
+            uniform = random.uniform
+            self.vel_x = [uniform(-speed, speed) for _ in range(n)]
+            self.vel_y = [uniform(-speed, speed) for _ in range(n)]
+        for i in range(n):
+            self.clock[i] = 0.0
+        self.last_ms = None
+
+    def stop(self):
+        for i in range(len(self)):
+            self.vel_x[i] = self.vel_y[i] = 0.0
+
+    def home(self):
+        # Snap every window back to its base position
+        for i in range(len(self)):
+            self.pos_x[i] = self.base_x[i]
+            self.pos_y[i] = self.base_y[i]
+
+    def step(self, speed, frozen=(), now_ms=None):
+        # One drift frame for every window not in `frozen`
+        if self.model == "analytic":
+            elapsed = ANIM_MS if self.last_ms is None or now_ms is None else now_ms - self.last_ms
+            self.last_ms = now_ms
+            # The velocity model moves at most `speed` px per ANIM_MS frame;
+            # the clock counts px of travel so the two look alike
+            self.advance(speed * elapsed / ANIM_MS, frozen)
+        elif self.np:
+            self.step_numpy(speed, frozen)
+        else:
+            self.step_python(speed, frozen)
+
+    def step_numpy(self, speed, frozen):
+        np_ = self.np
+        n = len(self)
+        radius = DRIFT_RADIUS
+        new = []
+        for pos, vel, base in ((self.pos_x, self.vel_x, self.base_x), (self.pos_y, self.vel_y, self.base_y)):
+            moved = pos + vel
+            offset = moved - base
+            bounced = np_.abs(offset) > radius
+            moved = np_.where(bounced, base + np_.clip(offset, -radius, radius), moved)
+            vel = np_.where(bounced, vel * -0.9, vel) + self.rng.uniform(-0.4, 0.4, n)
+            np_.clip(vel, -speed, speed, out=vel)
+            new.append((moved, vel))
+        (px, vx), (py, vy) = new
+        if frozen:
+            keep = np_.ones(n, dtype=bool)
+            keep[list(frozen)] = False
+            px = np_.where(keep, px, self.pos_x)
+            py = np_.where(keep, py, self.pos_y)
+            vx = np_.where(keep, vx, self.vel_x)
+            vy = np_.where(keep, vy, self.vel_y)
+        self.pos_x, self.pos_y, self.vel_x, self.vel_y = px, py, vx, vy
+
+    def advance(self, distance, frozen):
+        radius = DRIFT_RADIUS
+        if self.np:
+            np_ = self.np
+            moving = np_.ones(len(self), dtype=bool)
+            if frozen:
+                moving[list(frozen)] = False
+            self.clock = self.clock + np_.where(moving, distance, 0.0)
+            terms = self.amp * (np_.sin(self.freq * (self.clock / radius)[:, None] + self.phase) - np_.sin(self.phase))
+            self.pos_x = np_.where(moving, self.base_x + radius * terms[:, :DRIFT_WAVES].sum(axis=1), self.pos_x)
+            self.pos_y = np_.where(moving, self.base_y + radius * terms[:, DRIFT_WAVES:].sum(axis=1), self.pos_y)
+            return
+        sin = math.sin
+        for i in range(len(self.pos_x)):
+            if i in frozen:
+                continue
+            self.clock[i] = t = self.clock[i] + distance
+            t /= radius
+            offset = [a * (sin(f * t + p) - sin(p)) for a, f, p in zip(self.amp[i], self.freq[i], self.phase[i])]
+            self.pos_x[i] = self.base_x[i] + radius * sum(offset[:DRIFT_WAVES])
+            self.pos_y[i] = self.base_y[i] + radius * sum(offset[DRIFT_WAVES:])
+
+    def step_python(self, speed, frozen):
+        radius = DRIFT_RADIUS
+        uniform = random.uniform
+        base_x, base_y = self.base_x, self.base_y
+        pos_x, pos_y = self.pos_x, self.pos_y
+        vel_x, vel_y = self.vel_x, self.vel_y
+        for i in range(len(pos_x)):
+            if i in frozen:
+                continue
+            vx, vy = vel_x[i], vel_y[i]
+            nx = pos_x[i] + vx
+            ny = pos_y[i] + vy
+            dx = nx - base_x[i]
+            dy = ny - base_y[i]
+            if abs(dx) > radius:
+                nx = base_x[i] + (radius if dx > 0 else -radius)
+                vx = -vx * 0.9
+            if abs(dy) > radius:
+                ny = base_y[i] + (radius if dy > 0 else -radius)
+                vy = -vy * 0.9
+            vx += uniform(-0.4, 0.4)
+            vy += uniform(-0.4, 0.4)
+            vel_x[i] = speed if vx > speed else -speed if vx < -speed else vx
+            vel_y[i] = speed if vy > speed else -speed if vy < -speed else vy
+            pos_x[i] = nx
+            pos_y[i] = ny
+
+class BodyRun:
+    # A straight stretch of snake body inside one window, drawn as one item.
+    # (dr, dc) points from the tail end towards the head end; (0, 0) while the
+    # run is a single cell and could still grow either way.
+    __slots__ = ("w", "tag", "r0", "c0", "r1", "c1", "dr", "dc", "length")
+
+    def __init__(self, w, tag, r, c):
+        self.w = w
+        self.tag = tag
+        self.r0 = self.r1 = r
+        self.c0 = self.c1 = c
+        self.dr = self.dc = 0
+        self.length = 1
+
+FOOD_COLORS = {"normal": FOOD_COLOR, "reset": RESET_POWERUP_COLOR, "special": SPECIAL_FOOD_COLOR}
+
+class Renderer:
+    # What the game loop draws through. Each frame is begin_frame(),
+    # render(state) to apply whatever changed since the last frame, then
+    # end_frame().
+    def __init__(self, canvases=None, tcl=None):
+        pass
+
+    def attach(self, w):
+        # Canvas w was created after the renderer
+        pass
+
+    def begin_frame(self):
+        pass
+
+    def render(self, state):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def window_stats(self):
+        return "Windows redrawn: 0, skipped: 0"
+
+class NullRenderer(Renderer):
+    # Draws nothing, so headless runs and soak tests only pay for the rules.
+    pass
+
+class CanvasRenderer(Renderer):
+    # Retained-mode drawing: keeps the canvas item of every drawn segment and
+    # each frame only applies what changed since the last one (new heads,
+    # dropped tails, moved food), so Tk work per tick does not grow with
+    # snake length.
+    LAYERS = ("food", "snake", "aura", "enemy")
+
+    def __init__(self, canvases, tcl, runs=None):
+        self.canvases = canvases
+        self.tcl = tcl
+        # In runs mode the body is drawn as one item per straight stretch, so
+        # item count follows the number of turns rather than the length.
+        self.runs = SNAKE_RUNS if runs is None else runs
+        self.generation = None
+        # Windows touched by the current frame; the rest are left alone.
+        # Running totals let us check the savings on many-window setups.
+        self.dirty = set()
+        self.windows_redrawn = 0
+        self.windows_skipped = 0
+
+    def cell_box(self, row, col, pad=2):
+        x1 = col * CELL
+        y1 = row * CELL
+        return x1 + pad, y1 + pad, x1 + CELL - pad, y1 + CELL - pad
+
+    def run_box(self, run, pad=2):
+        return (min(run.c0, run.c1) * CELL + pad, min(run.r0, run.r1) * CELL + pad,
+                (max(run.c0, run.c1) + 1) * CELL - pad, (max(run.r0, run.r1) + 1) * CELL - pad)
+
+    def create(self, w, layer, box, color):
+        self.dirty.add(w)
+        canvas = self.canvases[w]
+        item = self.tcl.new_tag()
+        self.tcl.create_rect(canvas, item, box, color)
+        # Hidden per-layer markers keep the stacking order without a full redraw
+        self.tcl.raise_above(canvas, item, "layer_" + layer)
+        return item
+
+    def create_polygon(self, w, layer, points, color):
+        self.dirty.add(w)
+        canvas = self.canvases[w]
+        item = self.tcl.new_tag()
+        self.tcl.create_polygon(canvas, item, points, color)
+        self.tcl.raise_above(canvas, item, "layer_" + layer)
+        return item
+
+    def move(self, w, item, points):
+        self.dirty.add(w)
+        self.tcl.coords(self.canvases[w], item, points)
+
+    def recolor(self, w, item, color):
+        self.dirty.add(w)
+        self.tcl.recolor(self.canvases[w], item, color)
+
+    def delete(self, w, *items):
+        self.dirty.add(w)
+        self.tcl.delete(self.canvases[w], *items)
+
+    def add_layers(self, canvas):
+        for layer in self.LAYERS:
+            self.tcl.create_rect(canvas, "layer_" + layer, (0, 0, 0, 0), BG_COLOR, state="hidden")
+
+    def attach(self, w):
+        # Windows can be created after the first frame (see Serpentes.create_board);
+        # the game never draws on one before it exists
+        if self.generation is not None:
+            self.add_layers(self.canvases[w])
+
+    def clear(self):
+        self.dirty.update(range(len(self.canvases)))
+        for canvas in self.canvases:
+            if canvas is None:
+                continue
+            self.tcl.delete(canvas, "all")
+            self.add_layers(canvas)
+        self.snake_items = deque()  # (window, item) per segment, tail first
+        self.spare_items = []       # tail entries being recycled this frame
+        self.body_runs = deque()    # BodyRun per straight stretch, tail first
+        self.head_item = None       # (window, item) of the head in runs mode
+        self.head_pos = None
+        self.enemy_items = deque()  # (window, body item, (row, col))
+        self.aura_items = {}        # window -> aura polygon items
+        self.food_item = None
+        self.head_count = self.tail_count = 0
+        self.enemy_head_count = self.enemy_tail_count = 0
+        self.food_count = None
+
+    def begin_frame(self):
+        self.dirty.clear()
+
+    def render(self, state):
+        if state.generation != self.generation:
+            self.clear()
+            self.generation = state.generation
+        self.render_food(state)
+        if self.runs:
+            self.render_snake_runs(state)
+        else:
+            self.render_snake(state)
+        self.render_enemy(state)
+
+    def end_frame(self):
+        self.windows_redrawn += len(self.dirty)
+        self.windows_skipped += len(self.canvases) - len(self.dirty)
+
+    def window_stats(self):
+        total = self.windows_redrawn + self.windows_skipped
+        skipped = 100.0 * self.windows_skipped / total if total else 0.0
+        return f"Windows redrawn: {self.windows_redrawn}, skipped: {self.windows_skipped} ({skipped:.1f}% skipped)"
+
+    def render_food(self, state):
+        if state.food_count == self.food_count:
+            return
+        self.food_count = state.food_count
+        if self.food_item is not None:
+            w, item = self.food_item
+            self.delete(w, item)
+            self.food_item = None
+        if state.food:
+            w, r, c = state.food.pos
+            color = FOOD_COLORS[state.food.type]
+            self.food_item = (w, self.create(w, "food", self.cell_box(r, c), color))
+
+    def render_snake(self, state):
+        items = self.snake_items
+        added = state.head_count - self.head_count
+        removed = state.tail_count - self.tail_count
+        self.head_count = state.head_count
+        self.tail_count = state.tail_count
+        if added and items:
+            w, item = items[-1]
+            self.recolor(w, item, BODY_COLOR)
+        # Dropped tail segments are moved to the new head when it's in the
+        # same window, rather than deleted and created again
+        spare = self.spare_items
+        for _ in range(min(removed, len(items))):
+            spare.append(items.popleft())
+        snake = state.snake
+        for i in range(min(added, len(snake)), 0, -1):
+            w, r, c = state.cell_pos(snake[-i])
+            color = HEAD_COLOR if i == 1 else BODY_COLOR
+            if spare and spare[-1][0] == w:
+                entry = spare.pop()
+                self.move(w, entry[1], self.cell_box(r, c))
+                if color != BODY_COLOR:
+                    self.recolor(w, entry[1], color)
+                items.append(entry)
+            else:
+                items.append((w, self.create(w, "snake", self.cell_box(r, c), color)))
+        while spare:
+            w, item = spare.pop()
+            self.delete(w, item)
+
+    def render_snake_runs(self, state):
+        added = state.head_count - self.head_count
+        removed = state.tail_count - self.tail_count
+        self.head_count = state.head_count
+        self.tail_count = state.tail_count
+        snake = state.snake
+        if added >= len(snake):
+            # Fell behind by a whole snake length: redraw it from scratch
+            for run in self.body_runs:
+                self.delete(run.w, run.tag)
+            self.body_runs.clear()
+            if self.head_item is not None:
+                self.delete(*self.head_item)
+                self.head_item = None
+            self.head_pos = None
+            added = len(snake)
+            removed = 0
+
+        for _ in range(removed):
+            self.pop_body()
+        if not added:
+            return
+        # The old head and every new segment but the last become body
+        if self.head_pos is not None:
+            self.push_body(self.head_pos)
+        for i in range(added, 1, -1):
+            self.push_body(state.cell_pos(snake[-i]))
+
+        w, r, c = self.head_pos = state.cell_pos(snake[-1])
+        box = self.cell_box(r, c)
+        if self.head_item is not None and self.head_item[0] == w:
+            self.move(w, self.head_item[1], box)
+        else:
+            if self.head_item is not None:
+                self.delete(*self.head_item)
+            self.head_item = (w, self.create(w, "snake", box, HEAD_COLOR))
+
+    def push_body(self, pos):
+        w, r, c = pos
+        runs = self.body_runs
+        if runs:
+            run = runs[-1]
+            dr = r - run.r1
+            dc = c - run.c1
+            if run.w == w and abs(dr) + abs(dc) == 1 and (run.length == 1 or (dr == run.dr and dc == run.dc)):
+                run.r1, run.c1 = r, c
+                run.dr, run.dc = dr, dc
+                run.length += 1
+                self.move(w, run.tag, self.run_box(run))
+                return
+        run = BodyRun(w, None, r, c)
+        run.tag = self.create(w, "snake", self.run_box(run), BODY_COLOR)
+        runs.append(run)
+
+    def pop_body(self):
+        runs = self.body_runs
+        if not runs:
+            return
+        run = runs[0]
+        run.length -= 1
+        if not run.length:
+            runs.popleft()
+            self.delete(run.w, run.tag)
+            return
+        run.r0 += run.dr
+        run.c0 += run.dc
+        if run.length == 1:
+            run.dr = run.dc = 0
+        self.move(run.w, run.tag, self.run_box(run))
+
+    def render_enemy(self, state):
+        items = self.enemy_items
+        added = state.enemy_head_count - self.enemy_head_count
+        removed = state.enemy_tail_count - self.enemy_tail_count
+        self.enemy_head_count = state.enemy_head_count
+        self.enemy_tail_count = state.enemy_tail_count
+        changed = set()
+        if added and items:
+            w, body, cell = items[-1]
+            self.recolor(w, body, ENEMY_BODY_COLOR)
+        for _ in range(min(removed, len(items))):
+            w, body, cell = items.popleft()
+            self.delete(w, body)
+            changed.add(w)
+        enemy = state.enemy_snake
+        if enemy:
+            for i in range(min(added, len(enemy)), 0, -1):
+                w, r, c = state.cell_pos(enemy[-i])
+                color = ENEMY_HEAD_COLOR if i == 1 else ENEMY_BODY_COLOR
+                items.append((w, self.create(w, "enemy", self.cell_box(r, c), color), (r, c)))
+                changed.add(w)
+        for w in changed:
+            self.render_aura(w)
+
+    def render_aura(self, w):
+        # The aura is the padded outline of the enemy's cells in this window,
+        # drawn as one polygon per blob. Existing polygons are reshaped in
+        # place; only a change in the number of blobs creates or deletes items.
+        cells = [cell for win, body, cell in self.enemy_items if win == w]
+        polygons = aura_outline(cells, ENEMY_AURA_PAD)
+        aura = self.aura_items.setdefault(w, [])
+        for k, points in enumerate(polygons):
+            if k < len(aura):
+                self.move(w, aura[k], points)
+            else:
+                aura.append(self.create_polygon(w, "aura", points, ENEMY_AURA_COLOR))
+        while len(aura) > len(polygons):
+            self.delete(w, aura.pop())
+
+class FrameJob:
+    __slots__ = ("callback", "period_ms", "due_ms", "max_steps", "lateness")
+
+    def __init__(self, callback, period_ms, max_steps=1):
+        self.callback = callback
+        self.period_ms = period_ms
+        self.due_ms = None  # None while stopped
+        # Jobs with max_steps > 1 are called as callback(steps) and catch up
+        # on missed periods, up to that many per wakeup
+        self.max_steps = max_steps
+        self.lateness = deque(maxlen=120)  # ms past the deadline, recent wakeups
+
+class FrameScheduler:
+    # Every periodic job (game tick, drift, swaps, animations, HUD stats) runs
+    # off this one root.after() chain instead of a timer each. Jobs keep
+    # their own due times; a wakeup runs every job that is due, in the order
+    # they were added, then the frame hooks (the Tcl flush), then sleeps
+    # until the earliest due time. Jobs due within SLACK_MS of each other
+    # share a wakeup, so window moves and redraws land in the same frame.
+    # Due times are absolute (perf_counter based), so work done in a job
+    # doesn't push the next deadline back.
+    SLACK_MS = 4
+
+    def __init__(self, root):
+        self.root = root
+        self.jobs = {}
+        self.frame_hooks = []
+        self.after_id = None
+        self.in_frame = False
+        self.wakeups = 0
+        self.busy_ms = 0.0  # total time spent inside wake()
+        self.suspended_at = None  # set while suspended: no timer is armed at all
+        self.paused_ms = 0.0  # total time spent suspended
+
+    def now(self):
+        return time.perf_counter() * 1000.0
+
+    def game_time(self):
+        # Like now(), but stands still while suspended
+        return self.now() - self.paused_ms
+
+    def add(self, name, period_ms, callback, max_steps=1):
+        self.jobs[name] = FrameJob(callback, period_ms, max_steps)
+
+    def start(self, name, delay_ms=None):
+        job = self.jobs[name]
+        job.due_ms = self.now() + (job.period_ms if delay_ms is None else delay_ms)
+        self.rearm()
+
+    def stop(self, name):
+        self.jobs[name].due_ms = None
+
+    def is_running(self, name):
+        return self.jobs[name].due_ms is not None
+
+    def jitter(self, name):
+        # (mean, worst) distance from the deadline in ms over recent wakeups
+        samples = self.jobs[name].lateness
+        if not samples:
+            return 0.0, 0.0
+        return sum(abs(s) for s in samples) / len(samples), max(abs(s) for s in samples)
+
+    def stop_all(self):
+        for job in self.jobs.values():
+            job.due_ms = None
+        self.rearm()
+
+    def suspend(self):
+        # Drop the timer but keep every job's due time, so resume() picks up
+        # exactly where we left off
+        if self.suspended_at is not None:
+            return
+        self.suspended_at = self.now()
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+
+    def resume(self):
+        if self.suspended_at is None:
+            return
+        paused_for = self.now() - self.suspended_at
+        self.suspended_at = None
+        self.paused_ms += paused_for
+        for job in self.jobs.values():
+            if job.due_ms is not None:
+                job.due_ms += paused_for
+        self.rearm()
+
+    def rearm(self):
+        if self.in_frame or self.suspended_at is not None:
+            return  # wake() re-arms once all jobs have run; resume() re-arms
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+        due = [job.due_ms for job in self.jobs.values() if job.due_ms is not None]
+        if due:
+            delay = max(0, int(min(due) - self.now()))
+            self.after_id = self.root.after(delay, self.wake)
+
+    def wake(self):
+        self.after_id = None
+        self.wakeups += 1
+        self.in_frame = True
+        now = self.now()
+        try:
+            for job in self.jobs.values():
+                if job.due_ms is None or job.due_ms > now + self.SLACK_MS:
+                    continue
+                late = now - job.due_ms
+                job.lateness.append(late)
+                steps = 1
+                if late >= job.period_ms:
+                    steps = min(job.max_steps, 1 + int(late // job.period_ms))
+                job.due_ms += steps * job.period_ms
+                if job.due_ms <= now:
+                    job.due_ms = now + job.period_ms  # too far behind; drop the rest
+                if job.max_steps > 1:
+                    job.callback(steps)
+                else:
+                    job.callback()
+            for hook in tuple(self.frame_hooks):  # a hook may add or remove hooks
+                hook()
+        finally:
+            # Rearm even if a callback raised: Tk reports the error and
+            # carries on, and the loop has to carry on with it
+            self.in_frame = False
+            self.busy_ms += self.now() - now
+            self.rearm()
+
+class Observable:
+    # Named values with change notification: set() only calls the listeners
+    # when a value actually differs from what it was.
+    def __init__(self):
+        self.values = {}
+        self.listeners = []
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def get(self, name, default=None):
+        return self.values.get(name, default)
+
+    def set(self, name, value):
+        if name in self.values and self.values[name] == value:
+            return
+        self.values[name] = value
+        for listener in self.listeners:
+            listener(name, value)
+
+def ease_in_out(t):
+    return t * t * (3.0 - 2.0 * t)
+
+EASINGS = {"linear": lambda t: t, "ease_in_out": ease_in_out}
+
+class Tween:
+    __slots__ = ("target", "x0", "y0", "x1", "y1", "start_ms", "duration_ms",
+                 "easing", "group", "on_done", "on_cancel")
+
+    def __init__(self, target, start, end, start_ms, duration_ms, easing, group, on_done, on_cancel):
+        self.target = target
+        self.x0, self.y0 = start
+        self.x1, self.y1 = end
+        self.start_ms = start_ms
+        self.duration_ms = max(1.0, duration_ms)
+        self.easing = EASINGS[easing]
+        self.group = group
+        self.on_done = on_done
+        self.on_cancel = on_cancel
+
+class Tweens:
+    # Every running window animation (swaps, the reset snap-back) as plain
+    # data, advanced together by one call per frame. Positions come from the
+    # elapsed time, not a frame count, so a late or dropped frame just lands
+    # further along the curve instead of slowing the animation down.
+    def __init__(self, apply):
+        self.apply = apply  # apply(target, x, y)
+        self.active = []
+
+    def __len__(self):
+        return len(self.active)
+
+    def add(self, target, start, end, start_ms, duration_ms, easing="linear",
+            group=None, on_done=None, on_cancel=None):
+        tween = Tween(target, start, end, start_ms, duration_ms, easing, group, on_done, on_cancel)
+        self.active.append(tween)
+        return tween
+
+    def advance(self, now_ms):
+        finished = []
+        for tween in self.active:
+            t = (now_ms - tween.start_ms) / tween.duration_ms
+            if t >= 1.0:
+                t = 1.0
+                finished.append(tween)
+            elif t < 0.0:
+                continue
+            k = tween.easing(t)
+            self.apply(tween.target,
+                       tween.x0 + (tween.x1 - tween.x0) * k,
+                       tween.y0 + (tween.y1 - tween.y0) * k)
+        if finished:
+            self.active = [tween for tween in self.active if tween not in finished]
+            for tween in finished:
+                if tween.on_done:
+                    tween.on_done()
+
+    def cancel(self, group=None):
+        # Drop every tween in `group` (all of them for None) where it stands
+        cancelled = [tween for tween in self.active if group is None or tween.group == group]
+        if not cancelled:
+            return
+        self.active = [tween for tween in self.active if tween not in cancelled]
+        for tween in cancelled:
+            if tween.on_cancel:
+                tween.on_cancel()
+
+class GCMonitor:
+    # Shows whether ticks leave garbage behind and how long GC pauses are.
+    # gc.callbacks times every collection. Around each tick the gen-0 count,
+    # which goes up for every GC-tracked object allocated and down for every
+    # one freed, gives the net objects the tick retained. That is not a count
+    # of allocations: objects created and freed within the tick cancel out.
+    # Ticks during which a collection ran are not sampled, since it resets
+    # the count.
+    def __init__(self):
+        self.collections = 0
+        self.pause_ms = 0.0
+        self.worst_pause_ms = 0.0
+        self.started = None
+        self.ticks = 0
+        self.retained = 0
+        self.mark = 0
+        self.mark_collections = 0
+
+    def install(self):
+        gc.callbacks.append(self.on_gc)
+
+    def uninstall(self):
+        if self.on_gc in gc.callbacks:
+            gc.callbacks.remove(self.on_gc)
+
+    def on_gc(self, phase, info):
+        if phase == "start":
+            self.started = time.perf_counter()
+        elif self.started is not None:
+            pause = (time.perf_counter() - self.started) * 1000.0
+            self.started = None
+            self.collections += 1
+            self.pause_ms += pause
+            if pause > self.worst_pause_ms:
+                self.worst_pause_ms = pause
+
+    def begin_tick(self):
+        self.mark_collections = self.collections
+        self.mark = gc.get_count()[0]
+
+    def end_tick(self):
+        if self.collections == self.mark_collections:
+            self.retained += max(0, gc.get_count()[0] - self.mark)
+            self.ticks += 1
+
+    def retained_per_tick(self):
+        return self.retained / self.ticks if self.ticks else 0.0
+
+    def summary(self):
+        return (f"Net retained: {self.retained_per_tick():.2f} objects/tick over {self.ticks} ticks; "
+                f"GC: {self.collections} collections, {self.pause_ms:.1f} ms total, "
+                f"worst {self.worst_pause_ms:.2f} ms")
+
+RENDERERS = {"canvas": CanvasRenderer, "null": NullRenderer}
+
+class Serpentes:
+    def __init__(self, root):
+        self.root = root
+        self.windows = []   # OS windows showing boards (just root in viewport mode)
+        self.canvases = []  # one per board
+        self.drift = WindowDrift()  # base/live positions and velocities
+        self.window_size = (COLS*CELL, ROWS*CELL)
+        self.state = GameState()
+        self.swapping = set()
+        self.is_resetting = False # Flag for reset animation
+
+        self.drift_enabled = False
+        self.swap_enabled = False
+        self.swap_scheduled = False
+        self.tweens = Tweens(self.move_window)
+        # Why the scheduler is suspended ("game_over", "paused", "background");
+        # it only runs while this is empty
+        self.suspend_reasons = set()
+        self._background_check = None
+
+        self.tcl = TkCommandBatch(self.root)
+        self.init_windows()
+        self.renderer = RENDERERS[RENDERER](self.canvases, self.tcl)
+        self.startup_ms = None
+        self._game_over_window = None  # built on the first death, then reused
+        self.gc_monitor = GCMonitor() if GC_STATS else None
+        if self.gc_monitor:
+            self.gc_monitor.install()
+
+        self.scheduler = FrameScheduler(self.root)
+        self.scheduler.add("tick", TICK_MS, self.game_tick, MAX_CATCH_UP_TICKS)
+        self.scheduler.add("swap", SWAP_INTERVAL_MS, self.maybe_swap_windows)
+        self.scheduler.add("drift", ANIM_MS, self.animate_windows)
+        self.scheduler.add("animations", ANIM_MS, self.run_animations)
+        self.scheduler.add("stats", HUD_STATS_MS, self.sample_stats)
+        self.scheduler.add("boards", ANIM_MS, self.create_pending_boards)
+        self.scheduler.frame_hooks.append(self.flush_frame)
+        self.scheduler.frame_hooks.append(self.refresh_hud)
+
+        # HUD values; the score window only redraws the lines whose values
+        # changed, once per frame
+        self.hud = Observable()
+        self.hud.subscribe(self.on_hud_change)
+        self._hud_dirty = set()
+        self._hud_food_count = None
+        self._hud_length = None
+        self._steps_taken = 0
+        self._stats_sample = (self.scheduler.now(), 0, 0, 0.0)
+
+        self.reset_game()
+        self.scheduler.start("tick")
+        self.scheduler.start("stats")
+        self.root.bind_all("<Key>", self.on_key)
+        if PAUSE_IN_BACKGROUND:
+            for sequence in ("<FocusIn>", "<FocusOut>", "<Map>", "<Unmap>"):
+                self.root.bind_all(sequence, self.on_focus_change, add="+")
+
+        if self.pending_boards:
+            # The windows the snake and food are on exist now; the rest (and
+            # the score window) follow a few per frame
+            self.scheduler.start("boards", 0)
+        else:
+            self.finish_startup()
+        # First timer the main loop runs, whichever way the boards get made
+        self.root.after(0, self.note_first_frame)
+
+    def note_first_frame(self):
+        # Tk paints in idle callbacks, which come after this timer, so send
+        # the opening frame and let it paint before stopping the clock
+        self.flush_frame()
+        self.root.update_idletasks()
+        self.startup_ms = (time.perf_counter() - STARTED_AT) * 1000.0
+        if STARTUP_STATS:
+            print(f"Startup: {self.startup_ms:.0f} ms to first frame")
+
+    def create_pending_boards(self):
+        for i in sorted(self.pending_boards)[:BOARDS_PER_FRAME]:
+            self.create_board(i)
+        if not self.pending_boards:
+            self.scheduler.stop("boards")
+            if not hasattr(self, "score_win"):  # else: boards added during play
+                self.finish_startup()
+
+    def finish_startup(self):
+        self.create_score_window()
+        if STARTUP_STATS:
+            print(f"All {len(self.canvases)} windows up after {(time.perf_counter() - STARTED_AT) * 1000.0:.0f} ms")
+        if GC_FREEZE:
+            # Everything built so far lives for the whole session; keep it out
+            # of every later collection
+            gc.collect()
+            gc.freeze()
+
+    def create_boards_for(self, state):
+        # Make sure every window the game is about to draw on exists
+        per_window = state.rows * state.cols
+        wanted = {cell // per_window for cell in state.snake}
+        if state.food:
+            wanted.add(state.food.pos[0])
+        wanted.update(cell // per_window for cell in state.enemy_snake)
+        for i in wanted & self.pending_boards:
+            self.create_board(i)
+
+    def create_score_window(self):
+        x, y, total_width = self.score_anchor
+
+        self.score_win = tk.Toplevel(self.root)
+        self.score_win.title("Score")
+        self.score_win.geometry(f"{total_width}x{SCORE_WINDOW_HEIGHT}+{x}+{y}")
+        self.score_win.configure(bg=SCORE_BG_COLOR)
+        self.score_win.resizable(False, False)
+        self.score_win.protocol("WM_DELETE_WINDOW", lambda: None)
+
+        self.score_var = tk.StringVar(value="Score: 0")
+        self.score_label = tk.Label(
+            self.score_win,
+            textvariable=self.score_var,
+            font=SCORE_FONT,
+            fg=SCORE_FG_COLOR,
+            bg=SCORE_BG_COLOR
+        )
+        self.score_label.pack(expand=True, fill="both")
+
+        self.stats_var = tk.StringVar(value="")
+        self.stats_label = tk.Label(
+            self.score_win,
+            textvariable=self.stats_var,
+            font=(SCORE_FONT[0], 10),
+            fg=SCORE_FG_COLOR,
+            bg=SCORE_BG_COLOR
+        )
+        self.stats_label.pack(fill="x")
+
+        self._hud_dirty.update(self.hud.values)
+        self.refresh_hud()
+
+    def update_score_window(self):
+        # Called after anything that can change score or length. Score only
+        # changes with a food event (eaten, or a restart); length also grows
+        # on the ticks after special food, so check it directly. Plain moves
+        # skip the HUD entirely.
+        length = len(self.state.snake)
+        if self.state.food_count == self._hud_food_count and length == self._hud_length:
+            return
+        self._hud_food_count = self.state.food_count
+        self._hud_length = length
+        self.hud.set("score", self.state.score)
+        self.hud.set("length", length)
+
+    def sample_stats(self):
+        now = self.scheduler.now()
+        then, steps, wakeups, busy = self._stats_sample
+        elapsed = now - then
+        if elapsed > 0:
+            self.hud.set("tps", round((self._steps_taken - steps) * 1000.0 / elapsed, 1))
+        frames = self.scheduler.wakeups - wakeups
+        if frames:
+            self.hud.set("frame_ms", round((self.scheduler.busy_ms - busy) / frames, 1))
+        self._stats_sample = (now, self._steps_taken, self.scheduler.wakeups, self.scheduler.busy_ms)
+        if self.gc_monitor:
+            self.hud.set("retained", round(self.gc_monitor.retained_per_tick(), 1))
+            self.hud.set("gc_worst", round(self.gc_monitor.worst_pause_ms, 1))
+
+    def on_hud_change(self, name, value):
+        self._hud_dirty.add(name)
+
+    def refresh_hud(self):
+        dirty = self._hud_dirty
+        if not dirty or not hasattr(self, "score_var"):
+            return
+        if "score" in dirty:
+            self.score_var.set(f"Score: {self.hud.get('score', 0)}")
+        if dirty - {"score"}:
+            stats = (
+                f"Length {self.hud.get('length', 0)}  ·  "
+                f"{self.hud.get('tps', 0.0):.1f} ticks/s  ·  "
+                f"{self.hud.get('frame_ms', 0.0):.1f} ms/frame"
+            )
+            if self.gc_monitor:
+                stats += (f"  ·  {self.hud.get('retained', 0.0):.1f} net retained objs/tick  ·  "
+                          f"GC worst {self.hud.get('gc_worst', 0.0):.1f} ms")
+            self.stats_var.set(stats)
+        dirty.clear()
+
+    def get_drift_speed(self):
+        base_speed = 0.2
+        growth_factor = 0.05
+        return base_speed + growth_factor * len(self.state.snake)
+    
+    def init_windows(self):
+        # Lays out every board but only creates the first window; the rest are
+        # made by create_board() when the game first needs them or a few per
+        # frame after startup, whichever comes first
+        w_px, h_px = self.window_size
+        offset_x = 50
+        offset_y = 60
+        if DISPLAY_MODE == "viewport":
+            host_w, host_h = self.host_size = self.viewport_size(NUM_WINDOWS)
+            self.init_viewport(host_w, host_h, offset_x, offset_y)
+            self.score_anchor = (offset_x, offset_y + host_h + 40, host_w)
+        else:
+            self.positions = WindowPositions(self.tcl)
+            total_width = NUM_WINDOWS * w_px + (NUM_WINDOWS - 1) * 10
+            self.score_anchor = (offset_x, 240 + h_px, total_width)  # below the boards
+        self.pending_boards = set()
+        self.shown_boards = NUM_WINDOWS
+        for i in range(NUM_WINDOWS):
+            self.add_board_slot(i)
+        self.create_board(0)
+        if BOARDS_PER_FRAME <= 0:
+            for i in range(1, NUM_WINDOWS):
+                self.create_board(i)
+
+    def init_viewport(self, host_w, host_h, x, y):
+        # All boards in the root window, laid out in a grid on a host canvas
+        win = self.root
+        win.title(f"Serpentes")
+        win.protocol("WM_DELETE_WINDOW", lambda: None)
+        win.geometry(f"{host_w}x{host_h}+{x}+{y}")
+        win.resizable(False, False)
+        self.host = tk.Canvas(win, bg=SCORE_BG_COLOR, width=host_w, height=host_h, highlightthickness=0)
+        self.host.pack()
+        self.windows.append(win)
+        self.positions = ViewportPositions(self.tcl, self.host, (host_w, host_h), self.window_size)
+
+    def board_slot(self, i):
+        # Home position of board i: a row of windows, or a grid in the viewport
+        w_px, h_px = self.window_size
+        if DISPLAY_MODE == "viewport":
+            margin = 20
+            return (margin + (i % VIEWPORT_COLUMNS) * (w_px + 10),
+                    margin + (i // VIEWPORT_COLUMNS) * (h_px + 10))
+        return 50 + i * (w_px + 10), 60
+
+    def viewport_size(self, boards):
+        w_px, h_px = self.window_size
+        columns = max(1, min(boards, VIEWPORT_COLUMNS))
+        rows = (boards + VIEWPORT_COLUMNS - 1) // VIEWPORT_COLUMNS
+        return 40 + columns * w_px + (columns - 1) * 10, 40 + rows * h_px + (rows - 1) * 10
+
+    def add_board_slot(self, i):
+        # Reserve board i; its window is created later by create_board()
+        x, y = self.board_slot(i)
+        self.canvases.append(None)
+        self.positions.add(None, x, y)
+        self.drift.add(x, y)
+        self.pending_boards.add(i)
+
+    def sync_boards(self):
+        # Match the boards on screen to the game's window count: special food
+        # adds windows, a restart drops back to the configured number. Boards
+        # no longer in play are hidden and kept, and shown again the next time
+        # the game grows that far.
+        n = self.state.num_windows
+        while self.shown_boards < n:
+            i = self.shown_boards
+            self.shown_boards += 1
+            if i == len(self.canvases):
+                self.add_board_slot(i)
+                if BOARDS_PER_FRAME <= 0:
+                    self.create_board(i)
+                elif not self.scheduler.is_running("boards"):
+                    self.scheduler.start("boards", 0)
+            elif i not in self.pending_boards:
+                self.show_board(i, True)
+            if self.drift_enabled:
+                speed = self.get_drift_speed()
+                self.drift.set_vel(i, random.uniform(-speed, speed), random.uniform(-speed, speed))
+        while self.shown_boards > n:
+            self.shown_boards -= 1
+            if self.shown_boards not in self.pending_boards:
+                self.show_board(self.shown_boards, False)
+        if DISPLAY_MODE == "viewport":
+            size = self.viewport_size(max(n, NUM_WINDOWS))
+            if size != self.host_size:
+                self.host_size = size
+                self.host.configure(width=size[0], height=size[1])
+                self.root.geometry(f"{size[0]}x{size[1]}")
+                self.positions.resize(size)
+
+    def show_board(self, i, shown):
+        win = self.positions.windows[i]
+        if DISPLAY_MODE == "viewport":
+            self.host.itemconfigure(win, state="normal" if shown else "hidden")
+        elif shown:
+            win.deiconify()
+        else:
+            win.withdraw()
+
+    def create_board(self, i):
+        w_px, h_px = self.window_size
+        x, y = (int(round(v)) for v in self.drift.get(i))
+        if DISPLAY_MODE == "viewport":
+            canvas = tk.Canvas(self.host, bg=BG_COLOR, width=w_px, height=h_px, highlightthickness=0)
+            win = f"board{i}"
+            self.host.create_window(x, y, window=canvas, anchor="nw", tags=win)
+        else:
+            if i == 0:
+                win = self.root
+            else:
+                win = tk.Toplevel(self.root)
+            win.title(f"Serpentes")
+            win.protocol("WM_DELETE_WINDOW", lambda: None)
+            win.geometry(f"{w_px}x{h_px}+{x}+{y}")
+            win.resizable(False, False)
+            canvas = tk.Canvas(win, bg=BG_COLOR, width=w_px, height=h_px, highlightthickness=0)
+            canvas.pack()
+            self.windows.append(win)
+        self.canvases[i] = canvas
+        self.positions.attach(i, win, x, y)
+        self.pending_boards.discard(i)
+        if i >= self.shown_boards:
+            self.show_board(i, False)  # dropped by a restart before it was made
+        if hasattr(self, "renderer"):
+            self.renderer.attach(i)
+
+    def place_window(self, i, x, y):
+        self.positions.move(i, x, y)
+
+    def flush_frame(self):
+        self.positions.flush()
+        self.tcl.flush()
+
+    def enable_window_behaviours_if_needed(self):
+        if len(self.state.snake) >= DRIFT_UNLOCK_LENGTH and not self.drift_enabled:
+            self.drift_enabled = True
+            self.swap_enabled = True
+            self.state.reset_powerups = True
+            self.drift.randomize(self.get_drift_speed())
+            self.scheduler.start("drift")
+            self.scheduler.start("swap")
+
+    def disable_window_behaviours(self, snap_back=True):
+        self.drift_enabled = False
+        self.swap_enabled = False
+        self.state.reset_powerups = False
+        self.scheduler.stop("drift")
+        self.scheduler.stop("swap")
+        self.drift.stop()
+        if snap_back:
+            self.drift.home()
+            for i in range(self.shown_boards):
+                self.place_window(i, *self.drift.get(i))
+
+    def animate_windows(self):
+        if not self.drift_enabled or not self.state.running:
+            self.scheduler.stop("drift")
+            return
+
+        self.drift.step(self.get_drift_speed(), self.swapping, self.scheduler.game_time())
+        pos_x = self.drift.pos_x.tolist() if self.drift.np else self.drift.pos_x
+        pos_y = self.drift.pos_y.tolist() if self.drift.np else self.drift.pos_y
+        for i in range(self.shown_boards):
+            if i not in self.swapping:
+                self.place_window(i, pos_x[i], pos_y[i])
+
+    def maybe_swap_windows(self):
+        if not self.swap_enabled or not self.state.running:
+            self.scheduler.stop("swap")
+            return
+
+        if self.shown_boards < 2:
+            return  # nothing to swap with
+        if random.random() < 0.55:
+            a, b = random.sample(range(self.shown_boards), 2)
+            if a not in self.swapping and b not in self.swapping:
+                self.animate_swap(a, b, SWAP_DURATION_MS)
+
+    def move_window(self, i, x, y):
+        self.drift.set(i, x, y)
+        self.place_window(i, x, y)
+
+    def start_tween(self, *args, **kwargs):
+        self.tweens.add(*args, **kwargs)
+        if not self.scheduler.is_running("animations"):
+            self.scheduler.start("animations", 0)
+
+    def run_animations(self):
+        if not self.state.running:
+            self.tweens.cancel()
+        else:
+            self.tweens.advance(self.scheduler.game_time())
+        if not self.tweens:
+            self.scheduler.stop("animations")
+
+    def animate_swap(self, a, b, duration_ms):
+        if self.is_resetting:
+            return  # windows are tweening home; a swap would fight over them
+        if a == b or a in self.swapping or b in self.swapping:
+            return
+
+        self.swapping.add(a)
+        self.swapping.add(b)
+
+        start_a = self.drift.get(a)
+        start_b = self.drift.get(b)
+        old_vel_a = self.drift.get_vel(a)
+        old_vel_b = self.drift.get_vel(b)
+        self.drift.set_vel(a, 0.0, 0.0)
+        self.drift.set_vel(b, 0.0, 0.0)
+
+        def cancelled():
+            self.swapping.discard(a)
+            self.swapping.discard(b)
+
+        def done():
+            self.drift.swap_base(a, b)
+            def restore(old):
+                vx = old[0] if abs(old[0]) > 1e-3 else random.uniform(-0.6, 0.6)
+                vy = old[1] if abs(old[1]) > 1e-3 else random.uniform(-0.6, 0.6)
+                return vx, vy
+            self.drift.set_vel(a, *restore(old_vel_a))
+            self.drift.set_vel(b, *restore(old_vel_b))
+            cancelled()
+
+        now = self.scheduler.game_time()
+        self.start_tween(a, start_a, start_b, now, duration_ms, "ease_in_out",
+                         group="swap", on_cancel=cancelled)
+        self.start_tween(b, start_b, start_a, now, duration_ms, "ease_in_out",
+                         group="swap", on_done=done, on_cancel=cancelled)
+
+    def trigger_window_reset(self):
+        self.is_resetting = True
+        self.disable_window_behaviours(snap_back=False)
+        self.tweens.cancel("swap")
+        self.animate_reset_windows(750)
+
+    def animate_reset_windows(self, duration_ms):
+        def done():
+            self.is_resetting = False
+
+        now = self.scheduler.game_time()
+        last = self.shown_boards - 1
+        for i in range(self.shown_boards):
+            self.start_tween(i, self.drift.get(i), self.drift.get_base(i), now, duration_ms,
+                             group="reset",
+                             on_done=done if i == last else None,
+                             on_cancel=done if i == last else None)
+
+    def suspend(self, reason):
+        self.suspend_reasons.add(reason)
+        self.scheduler.suspend()
+
+    def resume(self, reason):
+        self.suspend_reasons.discard(reason)
+        if not self.suspend_reasons:
+            self.scheduler.resume()
+
+    def on_focus_change(self, event):
+        # Focus/map events come in bursts; look at the end result once idle
+        if self._background_check is None:
+            self._background_check = self.root.after_idle(self.check_background)
+
+    def check_background(self):
+        self._background_check = None
+        try:
+            focused = self.root.focus_get() is not None
+        except (KeyError, tk.TclError):
+            focused = False
+        visible = any(win.winfo_ismapped() and win.state() != "iconic" for win in self.windows)
+        if focused and visible:
+            self.resume("background")
+        else:
+            self.suspend("background")
+
+    def toggle_pause(self):
+        if "paused" in self.suspend_reasons:
+            self.resume("paused")
+        elif self.state.running:
+            self.suspend("paused")
+
+    def reset_game(self):
+        self.tweens.cancel()
+        self.is_resetting = False
+        self.swapping.clear()
+        self.disable_window_behaviours()
+        self.drift.home()
+        for i in range(len(self.canvases)):
+            self.place_window(i, *self.drift.get(i))
+        self.state.reset()
+        self.sync_boards()
+        self.draw_all()
+        self.update_score_window()
+        self.flush_frame()
+        self.refresh_hud()
+        self.suspend_reasons.discard("paused")
+        self.resume("game_over")
+
+    def on_key(self, event):
+        key = event.keysym.lower()
+        direction = KEY_DIRECTIONS.get(key)
+        if key == "p":
+            self.toggle_pause()
+        elif "paused" in self.suspend_reasons:
+            return  # keep the exact state until unpaused
+        elif direction is not None:
+            self.state.turn(direction)
+        elif key == "r":
+            if not self.state.running:
+                self.close_game_over()
+                self.reset_game()
+
+    def step(self):
+        self._steps_taken += 1
+        if not self.state.step():
+            self.game_over(self.state.death_reason)
+            return
+        if self.state.eaten == 'reset':
+            self.trigger_window_reset()
+        elif self.state.num_windows != self.shown_boards:
+            self.sync_boards()
+        self.enable_window_behaviours_if_needed()
+
+    def draw_all(self):
+        if self.pending_boards:
+            self.create_boards_for(self.state)
+        self.renderer.begin_frame()
+        self.renderer.render(self.state)
+        self.renderer.end_frame()
+
+    def game_tick(self, steps=1):
+        # Fixed timestep: run every logic step we owe, then draw once
+        if not self.state.running:
+            return
+        monitor = self.gc_monitor
+        if monitor:
+            monitor.begin_tick()
+        for _ in range(steps):
+            self.step()
+            if not self.state.running:
+                return  # game over isn't steady state; left unsampled
+        self.draw_all()
+        self.update_score_window()
+        if monitor:
+            monitor.end_tick()
+
+    def game_over(self, reason):
+        self.state.running = False
+        self.disable_window_behaviours()
+        self.update_score_window()
+        self.refresh_hud()
+        self.show_game_over(reason)
+        # Nothing moves until a restart, so stop waking up at all
+        self.suspend("game_over")
+
+    def build_game_over(self):
+        # Built once and then withdrawn/re-shown, so restarting doesn't churn widgets
+        go = tk.Toplevel(self.root)
+        go.title("R.I.P Serpentes ⚀⚀")
+        go.geometry("520x220")
+        go.resizable(False, False)
+        go.protocol("WM_DELETE_WINDOW", go.withdraw)
+
+        self.go_heading = tk.StringVar()
+        title = tk.Label(go, textvariable=self.go_heading, font=("Segoe UI", 28, "bold"))
+        title.pack(pady=(12, 6))
+
+        self.go_reason = tk.StringVar()
+        death_label = tk.Label(go, textvariable=self.go_reason, wraplength=480, justify="left", fg="red", font=("Segoe UI", 11))
+        death_label.pack(padx=12)
+
+        self.go_note = tk.StringVar()
+        note = tk.Label(go, textvariable=self.go_note, wraplength=480, justify="left", font=("Segoe UI", 10))
+        note.pack(pady=(8, 0), padx=12)
+
+        btn_frame = tk.Frame(go)
+        btn_frame.pack(pady=10)
+
+        def restart():
+            self.close_game_over()
+            self.reset_game()
+
+        def close_all():
+            print(self.renderer.window_stats())
+            print(f"Window moves sent: {self.positions.moves_sent}, skipped: {self.positions.moves_skipped}")
+            print(self.tcl.summary())
+            mean, worst = self.scheduler.jitter("tick")
+            print(f"Tick jitter: mean {mean:.2f} ms, worst {worst:.2f} ms")
+            if self.gc_monitor:
+                print(self.gc_monitor.summary())
+            self.root.quit()
+            self.root.destroy()
+
+        btn_ok = tk.Button(btn_frame, text="Restart", command=restart)
+        btn_ok.pack(side="left", padx=6)
+        btn_close = tk.Button(btn_frame, text="Close", command=close_all)
+        btn_close.pack(side="left", padx=6)
+
+        self._game_over_window = go
+
+    def show_game_over(self, reason):
+        if self._game_over_window is None:
+            self.build_game_over()
+        self.go_heading.set("⚅⚅ BOARD CLEARED ⚅⚅" if self.state.won else "⚀⚀ SNAKE EYES ⚀⚀")
+        self.go_reason.set(reason)
+        self.go_note.set(f"Score: {self.state.score} — Watch your snake near the end!")
+        self._game_over_window.deiconify()
+        self._game_over_window.lift()
+
+    def close_game_over(self):
+        if self._game_over_window is not None:
+            self._game_over_window.withdraw()
+
+    def fatal_error(self, message):
+        print(f"FATAL ERROR: {message}")
+    
+        self.state.running = False
+        try:
+            self.scheduler.stop_all()
+        except Exception:
+            pass
+    
+        try:
+            self.root.quit()
+            self.root.destroy()
+        except Exception:
+            pass
+
+def autopilot(state):
+    # Greedy food chaser used for headless runs; not meant to play well.
+    hw, hr, hc = state.cell_pos(state.snake[-1])
+    fw, fr, fc = state.food.pos
+    if fw != hw:
+        return RIGHT
+    if fr < hr:
+        return UP
+    if fr > hr:
+        return DOWN
+    return LEFT if fc < hc else RIGHT
+
+def run_headless(ticks, seed=None, renderer=None, monitor=None):
+    # Steps the rules without any Tk root and restarts on death, drawing
+    # every tick through `renderer` (a NullRenderer by default). A GCMonitor
+    # passed as `monitor` samples each state.step().
+    # Returns (ticks per second, games played, seconds simulating, seconds rendering).
+    state = GameState(rng=random.Random(seed))
+    state.reset_powerups = True
+    renderer = NullRenderer() if renderer is None else renderer
+    clock = time.perf_counter
+    games = 1
+    sim = draw = 0.0
+    for _ in range(ticks):
+        direction = autopilot(state)
+        t0 = clock()
+        if monitor:
+            monitor.begin_tick()
+        if not state.step(direction):
+            state.reset()
+            games += 1
+        elif monitor:
+            monitor.end_tick()
+        t1 = clock()
+        renderer.begin_frame()
+        renderer.render(state)
+        renderer.end_frame()
+        sim += t1 - t0
+        draw += clock() - t1
+    elapsed = sim + draw
+    return ticks / elapsed if elapsed > 0 else float("inf"), games, sim, draw
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--headless":
+        ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+        monitor = GCMonitor() if GC_STATS else None
+        if monitor:
+            monitor.install()
+        tps, games, sim, draw = run_headless(ticks, monitor=monitor)
+        print(f"{ticks} ticks, {games} games, {tps:,.0f} ticks/sec")
+        print(f"simulation {sim * 1e6 / ticks:.2f} us/tick, rendering {draw * 1e6 / ticks:.2f} us/tick")
+        if monitor:
+            print(monitor.summary())
+        sys.exit(0)
+    try:
+        root = tk.Tk()
+        app = Serpentes(root)
+        root.mainloop()
+    except Exception as e:
+        print(f"UNHANDLED FATAL ERROR: {e}")
+        try:
+            root.destroy()
+        except:
+            pass